@@ -18,6 +18,8 @@
 
 #include "rpcserver.hpp"
 
+#include <xayagame/gamerpcserver.hpp>
+
 #include <glog/logging.h>
 
 namespace dem
@@ -51,6 +53,13 @@ RpcServer::getpendingstate ()
   return game.GetPendingJsonState ();
 }
 
+std::string
+RpcServer::waitforchange (const std::string& knownBlock)
+{
+  LOG (INFO) << "RPC method called: waitforchange " << knownBlock;
+  return xaya::GameRpcServer::DefaultWaitForChange (game, knownBlock);
+}
+
 Json::Value
 RpcServer::checktrade (const std::string& btxid)
 {
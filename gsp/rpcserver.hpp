@@ -56,6 +56,7 @@ public:
   Json::Value getnullstate () override;
   Json::Value getcurrentstate () override;
   Json::Value getpendingstate () override;
+  std::string waitforchange (const std::string& knownBlock) override;
 
   Json::Value checktrade (const std::string& btxid) override;
 
@@ -20,27 +20,87 @@
 
 from xayagametest.testcase import XayaGameTest
 
+import jsonrpclib
 import os
 import os.path
 import time
 
 
+# Path to the Democrit GSP binary in our build folder.
+BINARY = os.path.join (os.getenv ("top_builddir", ".."), "gsp", "democrit-gsp")
+
+
 class DemGspTest (XayaGameTest):
 
   def __init__ (self):
-    top_builddir = os.getenv ("top_builddir")
-    if top_builddir is None:
-      top_builddir = ".."
-    binary = os.path.join (top_builddir, "gsp", "democrit-gsp")
-    super (DemGspTest, self).__init__ ("dem", binary)
+    super (DemGspTest, self).__init__ ("dem", BINARY)
+
+  def expectResults (self, calls):
+    """
+    Polls the GSP until the given RPC calls return the expected data.
+    Each call is a tuple of the method name, its list of arguments, the
+    field of the result to check, and the expected value for it.  All calls
+    are sent as a single JSON-RPC batch, and the results have to be synced
+    to the current best block.  If that does not happen within two seconds,
+    the test fails.
+    """
+
+    bestBlk = self.rpc.xaya.getbestblockhash ()
+    expected = [c[3] for c in calls]
+
+    end = time.time () + 2
+    delay = 0.001
+    while True:
+      mc = jsonrpclib.MultiCall (self.rpc.game)
+      for method, args, _, _ in calls:
+        getattr (mc, method) (*args)
+      states = list (mc ())
+
+      synced = all (s["state"] == "up-to-date" and s["blockhash"] == bestBlk
+                    for s in states)
+      actual = [s[c[2]] for s, c in zip (states, calls)]
+      if (synced and actual == expected) or time.time () > end:
+        break
+
+      time.sleep (delay)
+      delay = min (2 * delay, 0.05)
+
+    self.assertEqual (actual, expected)
 
   def expectPending (self, expected):
-    time.sleep (0.05)
-    self.assertEqual (self.getPendingState (), expected)
+    self.expectResults ([("getpendingstate", [], "pending", expected)])
 
   def expectState (self, btxid, state):
-    actual = self.getCustomState ("data", "checktrade", btxid)
-    self.assertEqual (actual, state)
+    self.expectResults ([("checktrade", [btxid], "data", state)])
+
+  def getNewAddresses (self, num):
+    """
+    Returns num fresh addresses from the Xaya wallet, requesting all of
+    them with a single JSON-RPC batch.
+    """
+
+    mc = jsonrpclib.MultiCall (self.rpc.xaya)
+    for _ in range (num):
+      mc.getnewaddress ()
+
+    return list (mc ())
+
+  def sendMoves (self, moves):
+    """
+    Sends multiple moves for our game, each given as a tuple of name and
+    move.  Returns the list of btxids (see sendMove), which are looked up
+    with a single JSON-RPC batch for all transactions.
+    """
+
+    txids = []
+    for name, mv in moves:
+      txids.append (super ().sendMove (name, mv))
+
+    mc = jsonrpclib.MultiCall (self.rpc.xaya)
+    for txid in txids:
+      mc.getrawtransaction (txid, True)
+
+    return [data["btxid"] for data in mc ()]
 
   def sendMove (self, name, mv={}):
     """
@@ -49,36 +109,38 @@ class DemGspTest (XayaGameTest):
     than txid, since that is what we need later to query the game state.
     """
 
-    txid = super ().sendMove (name, mv)
-    data = self.rpc.xaya.getrawtransaction (txid, True)
-    return data["btxid"]
+    return self.sendMoves ([(name, mv)])[0]
 
   def run (self):
     self.collectPremine ()
     # For some reason we have to split the single premine coin into
     # multiple ones, otherwise the wallet does not like the reorg test.
-    sendTo = {
-      self.rpc.xaya.getnewaddress (): 100
-      for _ in range (5)
-    }
+    sendTo = {addr: 100 for addr in self.getNewAddresses (5)}
     self.rpc.xaya.sendmany ("", sendTo)
     self.generate (2)
     self.expectGameState ({})
-    self.expectPending ({})
     unknownHash = "aa" * 32
-    self.expectState (unknownHash, {"state": "unknown"})
+    self.expectResults ([
+      ("getpendingstate", [], "pending", {}),
+      ("checktrade", [unknownHash], "data", {"state": "unknown"}),
+    ])
     reorgBlk = self.rpc.xaya.getbestblockhash ()
+    self.assertEqual (self.rpc.game.waitforchange (unknownHash), reorgBlk)
 
     self.mainLogger.info ("Sending some moves...")
-    id1 = self.sendMove ("foo")
-    id2 = self.sendMove ("bar", mv="42")
-    id3 = self.sendMove ("foo")
-    self.expectPending ({
-      id1: {},
-      id2: {},
-      id3: {},
-    })
-    self.expectState (id1, {"state": "pending"})
+    id1, id2, id3 = self.sendMoves ([
+      ("foo", {}),
+      ("bar", "42"),
+      ("foo", {}),
+    ])
+    self.expectResults ([
+      ("getpendingstate", [], "pending", {
+        id1: {},
+        id2: {},
+        id3: {},
+      }),
+      ("checktrade", [id1], "data", {"state": "pending"}),
+    ])
     self.generate (1)
     height = self.rpc.xaya.getblockcount ()
     self.generate (20)
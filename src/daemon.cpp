@@ -403,6 +403,12 @@ Daemon::GetTrades () const
   return impl->trades.GetTrades ();
 }
 
+void
+Daemon::GetTradeUpdateCounts (uint64_t& started, uint64_t& finished) const
+{
+  impl->trades.GetUpdateCounts (started, finished);
+}
+
 bool
 Daemon::TakeOrder (const proto::Order& o, const Amount units)
 {
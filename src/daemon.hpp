@@ -118,6 +118,13 @@ public:
    */
   std::vector<proto::Trade> GetTrades () const;
 
+  /**
+   * Returns the number of periodic trade updates that have been started
+   * and finished so far.  This is mainly useful for tests, which can
+   * use it to wait until trades have been updated.
+   */
+  void GetTradeUpdateCounts (uint64_t& started, uint64_t& finished) const;
+
   /**
    * Requests to take another's order for the given number of units.
    * Returns true on success (if the process could at least be started)
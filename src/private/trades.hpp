@@ -31,6 +31,7 @@
 #include "rpc-stubs/demgsprpcclient.h"
 #include "rpc-stubs/xayarpcclient.h"
 
+#include <atomic>
 #include <chrono>
 #include <string>
 #include <vector>
@@ -272,6 +273,14 @@ private:
   /** RPC client for the g/dem GSP.  */
   RpcClient<DemGspRpcClient>& demGsp;
 
+  /**
+   * Number of runs of UpdateAndArchiveTrades that have been started and
+   * finished so far.  With these, integration tests can wait until
+   * an update has been done that started after some point in time.
+   */
+  std::atomic<uint64_t> updatesStarted;
+  std::atomic<uint64_t> updatesFinished;
+
   /** The periodic job running trade updates.  */
   std::unique_ptr<IntervalJob> updater;
 
@@ -339,6 +348,12 @@ public:
    */
   std::vector<proto::Trade> GetTrades () const;
 
+  /**
+   * Returns the number of periodic trade updates that have been
+   * started and finished so far.
+   */
+  void GetUpdateCounts (uint64_t& started, uint64_t& finished) const;
+
   /**
    * Adds a new trade, based on taking the given order (i.e. we are the
    * taker, and the order is from the counterparty).  Returns true on success,
@@ -29,6 +29,24 @@
 namespace democrit
 {
 
+namespace
+{
+
+/**
+ * Returns the JSON form of the daemon's trades, as returned from
+ * the gettrades RPC method.
+ */
+Json::Value
+GetTradesJson (const Daemon& daemon)
+{
+  Json::Value res(Json::arrayValue);
+  for (const auto& t : daemon.GetTrades ())
+    res.append (ProtoToJson (t));
+  return res;
+}
+
+} // anonymous namespace
+
 void
 RpcServer::Run ()
 {
@@ -63,6 +81,13 @@ RpcServer::getstatus ()
   res["gameid"] = daemon.GetAssetSpec ().GetGameId ();
   res["account"] = daemon.GetAccount ();
 
+  uint64_t started, finished;
+  daemon.GetTradeUpdateCounts (started, finished);
+  Json::Value updates(Json::objectValue);
+  updates["started"] = static_cast<Json::Int64> (started);
+  updates["finished"] = static_cast<Json::Int64> (finished);
+  res["tradeupdates"] = updates;
+
   return res;
 }
 
@@ -112,9 +137,18 @@ Json::Value
 RpcServer::gettrades ()
 {
   LOG (INFO) << "RPC method called: gettrades";
-  Json::Value res(Json::arrayValue);
-  for (const auto& t : daemon.GetTrades ())
-    res.append (ProtoToJson (t));
+  return GetTradesJson (daemon);
+}
+
+Json::Value
+RpcServer::gettradingstate (const std::string& asset)
+{
+  LOG (INFO) << "RPC method called: gettradingstate " << asset;
+
+  Json::Value res(Json::objectValue);
+  res["trades"] = GetTradesJson (daemon);
+  res["orderbook"] = ProtoToJson (daemon.GetOrdersForAsset (asset));
+
   return res;
 }
 
@@ -77,6 +77,7 @@ public:
   Json::Value cancelorder (int id) override;
 
   Json::Value gettrades () override;
+  Json::Value gettradingstate (const std::string& asset) override;
   bool takeorder (const Json::Value& order, int units) override;
 
 };
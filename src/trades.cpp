@@ -809,7 +809,8 @@ TradeManager::TradeManager (State& s, MyOrders& mo, const AssetSpec& as,
                             RpcClient<DemGspRpcClient>& d,
                             const bool startUpdates)
   : state(s), myOrders(mo), spec(as),
-    xayaRpc(x), demGsp(d)
+    xayaRpc(x), demGsp(d),
+    updatesStarted(0), updatesFinished(0)
 {
   if (startUpdates)
     SetupUpdater (GetTradeTimeout ());
@@ -819,6 +820,7 @@ void
 TradeManager::UpdateAndArchiveTrades ()
 {
   VLOG (1) << "Running periodic update of trades...";
+  ++updatesStarted;
 
   std::string account;
   std::vector<proto::TradeState> finalised;
@@ -868,6 +870,8 @@ TradeManager::UpdateAndArchiveTrades ()
 
   LOG_IF (INFO, !finalised.empty ())
       << "Archived " << finalised.size () << " finalised trades";
+
+  ++updatesFinished;
 }
 
 std::vector<proto::Trade>
@@ -885,6 +889,13 @@ TradeManager::GetTrades () const
   return res;
 }
 
+void
+TradeManager::GetUpdateCounts (uint64_t& started, uint64_t& finished) const
+{
+  started = updatesStarted;
+  finished = updatesFinished;
+}
+
 void
 TradeManager::SetupUpdater (const Trade::Clock::duration intv)
 {
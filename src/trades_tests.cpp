@@ -2176,6 +2176,21 @@ TEST_F (TradeManagerTests, UnlocksChiInputsOnFailure)
   EXPECT_FALSE (tm.IsLocked ("buyer txid", 2));
 }
 
+TEST_F (TradeManagerTests, UpdateCounts)
+{
+  uint64_t started, finished;
+  tm.GetUpdateCounts (started, finished);
+  EXPECT_EQ (started, 0);
+  EXPECT_EQ (finished, 0);
+
+  tm.UpdateAndArchiveTrades ();
+  tm.UpdateAndArchiveTrades ();
+
+  tm.GetUpdateCounts (started, finished);
+  EXPECT_EQ (started, 2);
+  EXPECT_EQ (finished, 2);
+}
+
 /* ************************************************************************** */
 
 /**
@@ -18,10 +18,10 @@
 Python wrappers for running Democrit daemons for integration testing.
 """
 
-import copy
 import jsonrpclib
 import logging
 import os
+import socket
 import subprocess
 import time
 
@@ -34,6 +34,62 @@ ORDER_TIMEOUT = 0.1
 TRADE_TIMEOUT = 0.1
 
 
+def batch (rpc, calls):
+  """
+  Sends multiple RPC calls through the given ServerProxy as a single
+  JSON-RPC batch request, i.e. with just one HTTP round trip.  Each call is
+  given as a tuple of the method name and its arguments (either a list of
+  positional ones or a dict of named ones).  Returns the list of results
+  in the same order as the calls.
+  """
+
+  mc = jsonrpclib.MultiCall (rpc)
+  for method, args in calls:
+    if isinstance (args, dict):
+      getattr (mc, method) (**args)
+    else:
+      getattr (mc, method) (*args)
+
+  return list (mc ())
+
+
+def stripStartTimes (trades):
+  """
+  Strips out the start_time fields from a list of trades as returned by
+  the gettrades RPC method, since those cannot be directly compared to
+  golden data.
+  """
+
+  for t in trades:
+    assert "start_time" in t
+    del t["start_time"]
+
+  return trades
+
+
+def ordersOfAccount (orderbook, account):
+  """
+  Extracts the orders of the given account from an orderbook as returned
+  by getordersbyasset.  They are returned as a list sorted by ID and in
+  the format of getownorders, so that a daemon's own orders can be compared
+  against what other daemons have received of them.
+  """
+
+  res = []
+  for asset, book in orderbook.items ():
+    for side, typ in [("bids", "bid"), ("asks", "ask")]:
+      for o in book[side]:
+        if o["account"] != account:
+          continue
+        entry = dict (o)
+        del entry["account"]
+        entry["asset"] = asset
+        entry["type"] = typ
+        res.append (entry)
+
+  return sorted (res, key=lambda o: o["id"])
+
+
 class Daemon:
   """
   A context manager that runs a Democrit daemon (assumed to have the standard
@@ -50,45 +106,58 @@ class Daemon:
 
     self.log = logging.getLogger ("democrit")
 
-    self.args = [binary]
-    self.args.extend (["--rpc_port", str (port)])
-    self.args.extend (["--gsp_rpc_url", gspRpcUrl])
-    self.args.extend (["--xaya_rpc_url", xayaRpcUrl])
-    self.args.extend (["--dem_rpc_url", demGspUrl])
-    self.args.extend (["--account", account])
-    self.args.extend (["--jid", jid])
-    self.args.extend (["--password", password])
-    self.args.extend (["--room", room])
-    self.args.extend (["--democrit_xid_servers", "localhost"])
-    self.args.extend (["--democrit_order_timeout_ms",
-                       str (int (ORDER_TIMEOUT * 1_000))])
-    self.args.extend (["--democrit_confirmations", str (10)])
-    self.args.extend (["--democrit_trade_timeout_ms",
-                       str (int (TRADE_TIMEOUT * 1_000))])
-    self.args.extend (extraArgs)
+    self.args = [
+      binary,
+      "--rpc_port", str (port),
+      "--gsp_rpc_url", gspRpcUrl,
+      "--xaya_rpc_url", xayaRpcUrl,
+      "--dem_rpc_url", demGspUrl,
+      "--account", account,
+      "--jid", jid,
+      "--password", password,
+      "--room", room,
+      "--democrit_xid_servers", "localhost",
+      "--democrit_order_timeout_ms", str (int (ORDER_TIMEOUT * 1_000)),
+      "--democrit_confirmations", str (10),
+      "--democrit_trade_timeout_ms", str (int (TRADE_TIMEOUT * 1_000)),
+      *extraArgs,
+    ]
 
     self.cafile = None
 
     self.account = account
     self.basedir = basedir
+    self.port = port
     self.rpcurl = "http://localhost:%d" % port
     self.proc = None
 
+    # The environment for the process only depends on the basedir, so we
+    # can assemble it once here rather than on every start.
+    self.envVars = dict (os.environ)
+    self.envVars["GLOG_log_dir"] = basedir
+
   def __enter__ (self):
     assert self.proc is None
 
     self.log.info ("Starting new Democrit daemon for %s..." % self.account)
 
-    envVars = dict (os.environ)
-    envVars["GLOG_log_dir"] = self.basedir
-
-    args = copy.deepcopy (self.args)
+    args = list (self.args)
     if self.cafile is not None:
       args.extend (["--cafile", self.cafile])
 
-    self.proc = subprocess.Popen (args, env=envVars)
+    self.proc = subprocess.Popen (args, env=self.envVars)
     self.rpc = self.createRpc ()
 
+    # Until the RPC server is listening, all calls would just fail with
+    # an exception.  So first wait for the port with plain connection
+    # attempts, which are much cheaper.
+    while True:
+      with socket.socket () as s:
+        s.settimeout (0.05)
+        if s.connect_ex (("localhost", self.port)) == 0:
+          break
+      time.sleep (0.005)
+
     while True:
       try:
         state = self.rpc.getstatus ()
@@ -96,7 +165,8 @@ class Daemon:
           self.log.info ("Democrit daemon for %s is connected" % self.account)
           break
       except:
-        time.sleep (0.01)
+        pass
+      time.sleep (0.005)
 
     return self
 
@@ -104,6 +174,11 @@ class Daemon:
     assert self.proc is not None
 
     self.log.info ("Stopping Democrit daemon for %s..." % self.account)
+
+    # The client keeps its HTTP connection alive across calls, so we close
+    # it explicitly rather than leaving the daemon to deal with it.
+    self.rpc ("close") ()
+
     self.proc.terminate ()
     self.proc.wait ()
     self.proc = None
@@ -111,6 +186,8 @@ class Daemon:
   def createRpc (self):
     """
     Returns a fresh JSON-RPC client connection to the process' local server.
+    The underlying transport keeps a single HTTP/1.1 connection alive and
+    reuses it for all calls made through the returned proxy.
     """
 
     return jsonrpclib.ServerProxy (self.rpcurl)
@@ -132,6 +209,14 @@ class Daemon:
 
     return self.rpc.addorder (order=order)
 
+  def batch (self, calls):
+    """
+    Sends multiple calls to the daemon in a single JSON-RPC batch request.
+    See the batch function for details.
+    """
+
+    return batch (self.rpc, calls)
+
   def getTrades (self):
     """
     Returns the list of trades as per the gettrades RPC method.  It strips
@@ -139,10 +224,13 @@ class Daemon:
     golden data.
     """
 
-    data = self.rpc.gettrades ()
+    return stripStartTimes (self.rpc.gettrades ())
 
-    for d in data:
-      assert "start_time" in d
-      del d["start_time"]
+  def getTradesAndOrders (self, asset):
+    """
+    Returns the list of trades (like getTrades) and the orderbook for
+    the given asset, querying both with the gettradingstate RPC method.
+    """
 
-    return data
+    state = self.rpc.gettradingstate (asset=asset)
+    return stripStartTimes (state["trades"]), state["orderbook"]
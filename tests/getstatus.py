@@ -26,14 +26,19 @@ from testcase import NonFungibleTest
 class GetStatusTest (NonFungibleTest):
 
   def run (self):
-    with self.runDemocrit () as d1, \
-         self.runDemocrit () as d2:
+    with self.runDemocrits (num=2) as (d1, d2):
       for d in [d1, d2]:
-        self.assertEqual (d.rpc.getstatus (), {
+        status = d.rpc.getstatus ()
+        updates = status.pop ("tradeupdates")
+        self.assertEqual (status, {
           "account": d.account,
           "connected": True,
           "gameid": "nf",
         })
+        self.assertEqual (sorted (updates.keys ()), ["finished", "started"])
+        for val in updates.values ():
+          self.assertEqual (type (val), int)
+        self.assertLessEqual (updates["finished"], updates["started"])
 
 
 if __name__ == "__main__":
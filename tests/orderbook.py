@@ -28,8 +28,7 @@ class OrderbookTest (NonFungibleTest):
   def run (self):
     self.collectPremine ()
 
-    with self.runDemocrit () as d1, \
-         self.runDemocrit () as d2:
+    with self.runDemocrits (num=2) as (d1, d2):
 
       self.mainLogger.info ("Setting up test assets...")
       self.sendMove (d1.account, {"m": {"a": "foo", "n": 10}})
@@ -56,7 +55,6 @@ class OrderbookTest (NonFungibleTest):
       self.mainLogger.info ("Testing valid orders...")
       self.assertEqual (d1.addOrder ("bid", daBar, 1, 2), True)
       self.assertEqual (d1.addOrder ("ask", daFoo, 10, 1), True)
-      self.sleepSome ()
       self.assertEqual (d1.rpc.getownorders (), {
         "account": d1.account,
         "orders": [
@@ -78,7 +76,7 @@ class OrderbookTest (NonFungibleTest):
           },
         ],
       })
-      self.assertEqual (d2.rpc.getordersbyasset (), {
+      self.waitForEqual (d2.rpc.getordersbyasset, {
         daFoo: {
           "asset": daFoo,
           "bids": [],
@@ -110,7 +108,6 @@ class OrderbookTest (NonFungibleTest):
       self.mainLogger.info ("Cancelling an order...")
       d1.rpc.cancelorder (id=42)
       d1.rpc.cancelorder (id=1)
-      self.sleepSome ()
       self.assertEqual (d1.rpc.getownorders (), {
         "account": d1.account,
         "orders": [
@@ -124,7 +121,7 @@ class OrderbookTest (NonFungibleTest):
           },
         ],
       })
-      self.assertEqual (d2.rpc.getordersbyasset (), {
+      self.waitForEqual (d2.rpc.getordersbyasset, {
         daBar: {
           "asset": daBar,
           "asks": [],
@@ -31,8 +31,7 @@ class OrderRefreshTest (NonFungibleTest):
   def run (self):
     self.collectPremine ()
 
-    with self.runDemocrit () as d1, \
-         self.runDemocrit () as d2:
+    with self.runDemocrits (num=2) as (d1, d2):
 
       self.mainLogger.info ("Setting up test asset...")
       self.sendMove (d2.account, {"m": {"a": "foo", "n": 10}})
@@ -45,7 +44,6 @@ class OrderRefreshTest (NonFungibleTest):
       with self.runDemocrit () as d3:
         self.assertEqual (d2.addOrder ("ask", da, 10, 1), True)
         self.assertEqual (d3.addOrder ("bid", da, 5, 1), True)
-        self.sleepSome ()
         bid = {
           "account": d3.account,
           "id": 0,
@@ -60,13 +58,12 @@ class OrderRefreshTest (NonFungibleTest):
           "min_units": 1,
           "max_units": 1,
         }
-        self.assertEqual (d1.rpc.getordersforasset (asset=da), {
+        self.waitForEqual (lambda: d1.rpc.getordersforasset (asset=da), {
           "asset": da,
           "bids": [bid],
           "asks": [ask],
         })
 
-      time.sleep (3 * ORDER_TIMEOUT)
       expected = {
         "asset": da,
         "bids": [],
@@ -85,7 +82,7 @@ class OrderRefreshTest (NonFungibleTest):
           },
         ],
       }
-      self.assertEqual (d1.rpc.getordersforasset (asset=da), expected)
+      self.waitForEqual (lambda: d1.rpc.getordersforasset (asset=da), expected)
       self.assertEqual (d2.rpc.getownorders (), own)
 
       self.mainLogger.info ("Order invalidation...")
@@ -103,9 +100,8 @@ class OrderRefreshTest (NonFungibleTest):
       self.sendMove (d2.account, {"t": {"a": ja, "n": 1, "r": "domob"}})
       self.generate (1)
       self.syncGame ()
-      time.sleep (3 * ORDER_TIMEOUT)
-      self.assertEqual (d1.rpc.getordersbyasset (), {})
-      self.assertEqual (d2.rpc.getownorders (), {
+      self.waitForEqual (d1.rpc.getordersbyasset, {})
+      self.waitForEqual (d2.rpc.getownorders, {
         "account": d2.account,
         "orders": [],
       })
@@ -19,13 +19,21 @@ from xayagametest.testcase import XayaGameTest
 
 import democrit
 
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+import collections
+import functools
+import json
+import math
 import os
 import os.path
-import shutil
+import threading
 import time
 
 
+# Top build directory, in which the binaries under test are found.
+TOP_BUILDDIR = os.getenv ("top_builddir", "..")
+
 # XMPP configuration for our test environment (using the Charon
 # test XMPP Docker image).
 XMPP_CONFIG = {
@@ -38,6 +46,9 @@ XMPP_CONFIG = {
   ],
 }
 
+# Move (as JSON string) that mints the "test" asset used by the trading tests.
+TEST_MINT_MOVE = json.dumps ({"g": {"nf": {"m": {"a": "test", "n": 10}}}})
+
 
 class NonFungibleTest (XayaGameTest):
   """
@@ -48,23 +59,53 @@ class NonFungibleTest (XayaGameTest):
   def __init__ (self):
     super ().__init__ ("nf", "nonfungibled")
 
-    # For each of the XMPP accounts we have, we keep track if it is
-    # being used as part of an active Democrit daemon at the moment,
-    # so that we can give out free ports and accounts as needed for
-    # new daemons.
-    self.accountInUse = [False] * len (XMPP_CONFIG["accounts"])
+    # The Democrit daemons that are currently running.
+    self.activeDaemons = set ()
+
+    # JSON-RPC connections to Xaya Core wallets that are in use by daemons,
+    # keyed by the wallet name.  See walletRpc.
+    self.walletRpcs = {}
+    self.walletRpcsLock = threading.Lock ()
+
+    # Indices of the XMPP accounts that are not used by an active Democrit
+    # daemon at the moment, so that we can give out free ports and accounts
+    # as needed for new daemons.  Appending and popping on a deque is
+    # thread-safe, which is needed as daemons may be started in parallel.
+    self.freeAccounts = collections.deque (
+        range (len (XMPP_CONFIG["accounts"])))
 
   def setup (self):
+    # The data directories for Democrit daemons only depend on the account,
+    # so we create them once for all of them.
+    for account, _ in XMPP_CONFIG["accounts"]:
+      os.makedirs (self.getDemocritDir (account), exist_ok=True)
+
     self.log.info ("Starting Democrit GSP...")
 
     binary = self.getBinaryPath ("gsp", "democrit-gsp")
 
+    # The test's basedir is freshly created by XayaGameTest, so there is
+    # nothing to clean up here before creating our own directory.
     base = os.path.join (self.basedir, "dem")
-    shutil.rmtree (base, ignore_errors=True)
     os.mkdir (base)
 
     self.demGsp = game.Node (base, self.basePort + 10, [binary])
-    self.demGsp.start (self.xayanode.rpcurl, wait=True)
+
+    # The wait built into game.Node polls only once per second, which would
+    # add up to a full second to each test.  Instead, wait for the RPC
+    # server to come up with a much shorter interval ourselves.
+    self.demGsp.start (self.xayanode.rpcurl, wait=False)
+    while True:
+      try:
+        state = self.demGsp.rpc.getnullstate ()
+        break
+      except:
+        time.sleep (0.01)
+
+    # These cannot change while the GSP is running, so we just check them
+    # once here rather than on every sync.
+    self.assertEqual (state["gameid"], "dem")
+    self.assertEqual (state["chain"], "regtest")
 
   def shutdown (self):
     self.demGsp.stop ()
@@ -77,14 +118,15 @@ class NonFungibleTest (XayaGameTest):
 
     super ().syncGame ()
 
+    # Instead of polling, we block on waitforchange until the Democrit GSP
+    # has processed another block, and only then check again.
     bestBlk = self.rpc.xaya.getbestblockhash ()
     while True:
       state = self.demGsp.rpc.getnullstate ()
-      self.assertEqual (state["gameid"], "dem")
-      self.assertEqual (state["chain"], "regtest")
-      if state["state"] == "up-to-date" and state["blockhash"] == bestBlk:
+      knownBlk = state.get ("blockhash", "")
+      if state["state"] == "up-to-date" and knownBlk == bestBlk:
         return
-      time.sleep (0.01)
+      self.demGsp.rpc.waitforchange (knownBlk)
 
   @contextmanager
   def runDemocrit (self, wallet=""):
@@ -99,63 +141,243 @@ class NonFungibleTest (XayaGameTest):
 
     binary = self.getBinaryPath ("nonfungible", "nonfungible-democrit")
 
-    accountIndex = None
-    for i in range (len (self.accountInUse)):
-      if not self.accountInUse[i]:
-        accountIndex = i
-        break
-    if accountIndex is None:
+    try:
+      accountIndex = self.freeAccounts.popleft ()
+    except IndexError:
       raise RuntimeError ("no free account for another Democrit daemon")
 
-    # This will be set to a JSON-RPC ServerProxy for the Xaya Core
-    # with our selected wallet.  We need to make sure to clean it up
-    # after the test (close the socket), or else Xaya Core will wait
-    # for the connection to be closed on shutdown.
-    xaya = None
-
     try:
-      self.accountInUse[accountIndex] = True
       port = self.basePort + 11 + accountIndex
 
       accountConfig = XMPP_CONFIG["accounts"][accountIndex]
       account = accountConfig[0]
-      basedir = os.path.join (self.basedir, "democrit", account)
-      os.makedirs (basedir, exist_ok=True)
+      basedir = self.getDemocritDir (account)
       jid = "%s@%s" % (accountConfig[0], XMPP_CONFIG["server"])
 
-      xayaUrl, xaya = self.xayanode.getWalletRpc (wallet)
-
-      d = democrit.Daemon (basedir, binary, port, self.gamenode.rpcurl,
-                           xayaUrl, self.demGsp.rpcurl,
-                           account, jid, accountConfig[1],
-                           XMPP_CONFIG["room"])
-      d.cafile = self.getTestCaFile ()
-      # For convenience (e.g. to send CHI to the daemon's wallet), we store
-      # an RPC handle for the selected wallet inside the instance.
-      d.xaya = xaya
-      with d as entered:
-        yield entered
+      with self.walletRpc (wallet) as (xayaUrl, xaya):
+        d = democrit.Daemon (basedir, binary, port, self.gamenode.rpcurl,
+                             xayaUrl, self.demGsp.rpcurl,
+                             account, jid, accountConfig[1],
+                             XMPP_CONFIG["room"])
+        d.cafile = self.getTestCaFile ()
+        # For convenience (e.g. to send CHI to the daemon's wallet), we store
+        # an RPC handle for the selected wallet and its name inside
+        # the instance.
+        d.xaya = xaya
+        d.wallet = wallet
+        with d as entered:
+          self.activeDaemons.add (entered)
+          try:
+            yield entered
+          finally:
+            self.activeDaemons.remove (entered)
     finally:
-      self.accountInUse[accountIndex] = False
-      if xaya:
-        xaya ("close") ()
+      self.freeAccounts.append (accountIndex)
 
-  def sleepSome (self):
+  @contextmanager
+  def walletRpc (self, wallet):
     """
-    Sleeps a short amount of time, which should be enough in tests to
-    let all daemons sync through XMPP.
+    Returns a context manager that yields the RPC URL and a JSON-RPC
+    ServerProxy for the given wallet in Xaya Core.  Daemons using the same
+    wallet share one proxy (and thus one keep-alive connection).
+
+    The proxy is closed when the last user is done with it.  We need to make
+    sure to clean it up (close the socket), or else Xaya Core will wait
+    for the connection to be closed on shutdown.
     """
 
-    time.sleep (0.01)
+    with self.walletRpcsLock:
+      if wallet not in self.walletRpcs:
+        url, rpc = self.xayanode.getWalletRpc (wallet)
+        self.walletRpcs[wallet] = {"url": url, "rpc": rpc, "refs": 0}
+      entry = self.walletRpcs[wallet]
+      entry["refs"] += 1
+
+    try:
+      yield entry["url"], entry["rpc"]
+    finally:
+      with self.walletRpcsLock:
+        entry["refs"] -= 1
+        if entry["refs"] == 0:
+          del self.walletRpcs[wallet]
+          entry["rpc"] ("close") ()
 
-  def updateTrades (self):
+  @contextmanager
+  def runDemocrits (self, wallets=None, num=None):
     """
-    Sleeps a long enough time to make sure the trade update has been run
-    (e.g. timing out abandoned ones) by all active daemons.
+    Returns a context manager that runs multiple Democrit daemons at the
+    same time (each like runDemocrit), and yields the list of them.
+    The daemons are started and stopped in parallel, so that we only wait
+    once for all of them to connect.
+
+    wallets is the list of Xaya Core wallets to use, one per daemon.
+    Alternatively, num daemons can be run that all use the default wallet.
     """
 
+    if wallets is None:
+      wallets = [""] * num
+
+    managers = [self.runDemocrit (w) for w in wallets]
+    with ThreadPoolExecutor (max_workers=len (managers)) as pool:
+      futures = [pool.submit (m.__enter__) for m in managers]
+      started = [m for m, f in zip (managers, futures)
+                 if f.exception () is None]
+
+      try:
+        yield [f.result () for f in futures]
+      finally:
+        exits = [pool.submit (m.__exit__, None, None, None) for m in started]
+        for f in exits:
+          f.result ()
+
+  def waitForOrderSync (self, timeout=2.0):
+    """
+    Waits until all active daemons are synced through XMPP, i.e. each of
+    them knows the current orders of all others.  If that does not happen
+    within the timeout, the test fails.
+    """
+
+    daemons = list (self.activeDaemons)
+
+    end = time.time () + timeout
+    while True:
+      own = {}
+      books = {}
+      for d in daemons:
+        own[d], books[d] = d.batch ([
+          ("getownorders", {}),
+          ("getordersbyasset", {}),
+        ])
+
+      # Locked orders (those in a pending trade) are returned by getownorders,
+      # but not broadcast to the other daemons.
+      unlocked = {
+        d: [{k: v for k, v in o.items () if k != "locked"}
+            for o in own[d]["orders"] if not o.get ("locked", False)]
+        for d in daemons
+      }
+
+      synced = all (
+          democrit.ordersOfAccount (books[other], d.account) == unlocked[d]
+          for d in daemons for other in daemons if other is not d)
+      if synced:
+        return
+
+      assert time.time () < end, "timeout waiting for XMPP sync"
+      time.sleep (0.001)
+
+  def waitForEqual (self, fcn, expected, timeout=2.0):
+    """
+    Polls the given function (with exponential backoff) until it returns
+    the expected value.  If the expected value is not reached before the
+    timeout, the test fails.
+    """
+
+    end = time.time () + timeout
+    delay = 0.001
+    while True:
+      actual = fcn ()
+      if actual == expected or time.time () > end:
+        break
+      time.sleep (delay)
+      delay = min (2 * delay, 0.05)
+
+    self.assertEqual (actual, expected)
+
+  def assertLessEqual (self, a, b):
+    """
+    Asserts that a <= b, logging the values if not.
+    """
+
+    if a <= b:
+      return
+
+    self.log.error ("The value of:\n%s\n\nis greater than:\n%s" % (a, b))
+    raise AssertionError ("%s > %s" % (a, b))
+
+  def waitForOrderbook (self, d, asset, expected):
+    """
+    Waits until the orderbook for the given asset, as seen by the given
+    Democrit daemon, matches the expected value.
+    """
+
+    self.waitForEqual (lambda: d.rpc.getordersforasset (asset=asset),
+                       expected)
+
+  def updateTrades (self, forceWait=False):
+    """
+    Makes sure the trade update has been run (e.g. timing out abandoned ones)
+    by all active daemons.  For this, we wait until each daemon has finished
+    an update that was started only after the call.
+
+    The update counters do not tell us anything about the XMPP negotiation
+    of a trade, though.  If that needs to be done (e.g. right after a
+    takeorder call), forceWait can be set to just sleep a fixed time
+    long enough for it instead.
+
+    Finalising a trade may restore the maker's order, which is then
+    broadcast through XMPP.  So after the updates, we also wait for all
+    daemons to be synced on their orders (see waitForOrderSync).
+    """
+
+    self.syncGame ()
+
+    if forceWait:
+      time.sleep (1.5 * democrit.TRADE_TIMEOUT)
+      return
+
+    daemons = list (self.activeDaemons)
+    started = [d.rpc.getstatus ()["tradeupdates"]["started"] for d in daemons]
+
+    end = time.time () + 10 * democrit.TRADE_TIMEOUT
+    for d, s in zip (daemons, started):
+      while d.rpc.getstatus ()["tradeupdates"]["finished"] <= s:
+        assert time.time () < end, "timeout waiting for trade updates"
+        time.sleep (0.005)
+
+    self.waitForOrderSync ()
+
+  def createWallets (self, names):
+    """
+    Creates wallets with the given names in Xaya Core, using a single
+    JSON-RPC batch request.
+    """
+
+    democrit.batch (self.rpc.xaya, [("createwallet", [n]) for n in names])
+
+  def setupTradingAccounts (self, buyer, seller):
+    """
+    Sets up the accounts for a trading test between the two Democrit daemons:
+    Their wallets receive 100 CHI each (only once if they share the wallet),
+    and the seller registers their name, minting 10 units of the "test"
+    asset into it.  Returns the seller's name.
+    """
+
+    wallets = {}
+    for d in [seller, buyer]:
+      wallets.setdefault (d.wallet, d.xaya)
+    self.rpc.xaya.sendmany ("", {
+      w.getnewaddress (): 100 for w in wallets.values ()
+    })
+
+    sellerName = "p/%s" % seller.account
+    opt = {"destAddress": seller.xaya.getnewaddress ()}
+    self.rpc.xaya.name_register (sellerName, TEST_MINT_MOVE, opt)
+    self.generate (1)
     self.syncGame ()
-    time.sleep (1.5 * democrit.TRADE_TIMEOUT)
+
+    return sellerName
+
+  def waitForTradeTimeout (self):
+    """
+    Sleeps long enough for trades started before to time out.  Since the
+    start time and current time are both tracked in whole seconds, the
+    difference between them has to reach the next integer above the timeout,
+    which may take up to that many seconds of real time (plus some margin
+    for the counterparty, which starts the trade a bit later).
+    """
+
+    time.sleep (math.floor (democrit.TRADE_TIMEOUT) + 1 + 0.2)
 
   def jsonAsset (self, minter, asset):
     """
@@ -164,23 +386,33 @@ class NonFungibleTest (XayaGameTest):
 
     return {"m": minter, "a": asset}
 
-  def democritAsset (self, minter, asset):
+  @staticmethod
+  @functools.lru_cache (maxsize=None)
+  def democritAsset (minter, asset):
     """
-    Returns the Democrit asset string for a non-fungible asset.
+    Returns the Democrit asset string for a non-fungible asset.  Since the
+    result is an immutable string, it is cached.
     """
 
     return "%s\n%s" % (minter, asset)
 
-  def getBinaryPath (self, *components):
+  def getDemocritDir (self, account):
     """
-    Returns the path to a binary that is somewhere in our build folder.
+    Returns the data directory used by Democrit daemons for
+    the given XMPP account.
     """
 
-    top_builddir = os.getenv ("top_builddir")
-    if top_builddir is None:
-      top_builddir = ".."
+    return os.path.join (self.basedir, "democrit", account)
 
-    return os.path.join (top_builddir, *components)
+  @staticmethod
+  @functools.lru_cache (maxsize=None)
+  def getBinaryPath (*components):
+    """
+    Returns the path to a binary that is somewhere in our build folder.
+    Since the build folder is fixed, the result is cached.
+    """
+
+    return os.path.join (TOP_BUILDDIR, *components)
 
   def getTestCaFile (self):
     """
@@ -204,12 +436,52 @@ class NonFungibleTest (XayaGameTest):
     assert actual >= expected - eps, msg
     assert actual <= expected + eps, msg
 
-  def expectAsset (self, account, asset, expected):
+  def expectBalances (self, asset, chi, assets):
     """
-    Expects that the balance of the given asset with the given account
-    (in the nonfungible game state) matches some value.
+    Checks the outcome of trades in one go:  The CHI balances in the wallets
+    of the Democrit daemons in chi (a dict from daemon to amount) are
+    expected to match approximately, and the given asset balances exactly
+    (as per expectAssets, i.e. in a single batch).
     """
 
-    actual = self.getCustomState ("data", "getbalance",
-                                  name=account, asset=asset)
-    self.assertEqual (actual, expected)
+    for d, amount in chi.items ():
+      self.expectApproxBalance (d.xaya, amount)
+    self.expectAssets (asset, assets)
+
+  def getCustomStates (self, field, calls):
+    """
+    Calls multiple RPC methods on the game daemon that return game state,
+    similar to getCustomState.  The calls are given as tuples of the method
+    name and a dict of named arguments, and sent as a single JSON-RPC batch.
+    Makes sure the results are synced to the current best block, and returns
+    the list of the given field from each of them.
+    """
+
+    bestBlk = self.rpc.xaya.getbestblockhash ()
+    while True:
+      states = democrit.batch (self.rpc.game, calls)
+
+      synced = True
+      for s in states:
+        self.assertEqual (s["gameid"], self.gameId)
+        if s["state"] != "up-to-date" or s["blockhash"] != bestBlk:
+          synced = False
+
+      if synced:
+        return [s[field] for s in states]
+
+      time.sleep (0.01)
+
+  def expectAssets (self, asset, expected):
+    """
+    Expects that the balances of the given asset (in the nonfungible game
+    state) match the expected values, which are given as dict from
+    account names to amounts.  All balances are queried in a single batch.
+    """
+
+    accounts = list (expected.keys ())
+    actual = self.getCustomStates ("data", [
+      ("getbalance", {"name": a, "asset": asset})
+      for a in accounts
+    ])
+    self.assertEqual (dict (zip (accounts, actual)), expected)
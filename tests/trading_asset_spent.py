@@ -25,7 +25,6 @@ the buyer's trade check and lead to the trade timing out in the end.
 from testcase import NonFungibleTest
 
 import json
-import time
 
 
 class TradingAssetSpentTest (NonFungibleTest):
@@ -33,30 +32,18 @@ class TradingAssetSpentTest (NonFungibleTest):
   def run (self):
     self.collectPremine ()
 
-    self.rpc.xaya.createwallet ("buyer")
-    self.rpc.xaya.createwallet ("seller")
+    self.createWallets (["buyer", "seller"])
 
-    with self.runDemocrit ("buyer") as buyer, \
-         self.runDemocrit ("seller") as seller:
+    with self.runDemocrits (["buyer", "seller"]) as (buyer, seller):
 
       self.mainLogger.info ("Setting up test accounts...")
-      self.rpc.xaya.sendmany ("", {
-        seller.xaya.getnewaddress (): 100,
-        buyer.xaya.getnewaddress (): 100,
-      })
-      sellerName = "p/%s" % seller.account
-      mv = {"g": {"nf": {"m": {"a": "test", "n": 10}}}}
-      opt = {"destAddress": seller.xaya.getnewaddress ()}
-      self.rpc.xaya.name_register (sellerName, json.dumps (mv), opt)
+      sellerName = self.setupTradingAccounts (buyer, seller)
       demAsset = self.democritAsset (seller.account, "test")
       jsonAsset = self.jsonAsset (seller.account, "test")
-      self.generate (1)
-      self.syncGame ()
 
       self.mainLogger.info ("Setting up a buy order...")
       self.assertEqual (buyer.addOrder ("bid", demAsset, 1, 10), True)
-      self.sleepSome ()
-      self.assertEqual (seller.rpc.getordersforasset (asset=demAsset), {
+      self.waitForOrderbook (seller, demAsset, {
         "asset": demAsset,
         "bids": [
           {
@@ -94,29 +81,30 @@ class TradingAssetSpentTest (NonFungibleTest):
 
       self.mainLogger.info ("Timing out the trade...")
       # Note that the start time is tracked in seconds, so even though the
-      # timeout is just very short, we need to wait for a few seconds at least
+      # timeout is just very short, we need to wait for about a second
       # for it to work.
-      time.sleep (3)
+      self.waitForTradeTimeout ()
       self.updateTrades ()
-      self.assertEqual (seller.getTrades (), [{
+      self.assertEqual (buyer.getTrades (), [{
         "state": "abandoned",
-        "counterparty": buyer.account,
+        "counterparty": seller.account,
         "asset": demAsset,
-        "type": "ask",
-        "role": "taker",
+        "type": "bid",
+        "role": "maker",
         "price_sat": int (1e8),
         "units": 6,
       }])
-      self.assertEqual (buyer.getTrades (), [{
+      trades, orders = seller.getTradesAndOrders (demAsset)
+      self.assertEqual (trades, [{
         "state": "abandoned",
-        "counterparty": seller.account,
+        "counterparty": buyer.account,
         "asset": demAsset,
-        "type": "bid",
-        "role": "maker",
+        "type": "ask",
+        "role": "taker",
         "price_sat": int (1e8),
         "units": 6,
       }])
-      self.assertEqual (seller.rpc.getordersforasset (asset=demAsset), {
+      self.assertEqual (orders, {
         "asset": demAsset,
         "bids": [
           {
@@ -131,11 +119,11 @@ class TradingAssetSpentTest (NonFungibleTest):
       })
 
       self.generate (1)
-      self.expectApproxBalance (seller.xaya, 100)
-      self.expectApproxBalance (buyer.xaya, 100)
-      self.expectAsset (seller.account, jsonAsset, 5)
-      self.expectAsset ("third", jsonAsset, 5)
-      self.expectAsset (buyer.account, jsonAsset, 0)
+      self.expectBalances (jsonAsset, {seller: 100, buyer: 100}, {
+        seller.account: 5,
+        "third": 5,
+        buyer.account: 0,
+      })
 
 
 if __name__ == "__main__":
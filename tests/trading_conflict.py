@@ -25,7 +25,7 @@ conflicted and confirm as such.
 
 from testcase import NonFungibleTest
 
-import json
+import jsonrpclib
 
 
 class TradingConflictTest (NonFungibleTest):
@@ -39,25 +39,15 @@ class TradingConflictTest (NonFungibleTest):
   def run (self):
     self.collectPremine ()
 
-    self.rpc.xaya.createwallet ("buyer")
-    self.rpc.xaya.createwallet ("seller")
+    self.createWallets (["buyer", "seller"])
 
-    with self.runDemocrit ("buyer") as buyer, \
-         self.runDemocrit ("seller") as seller:
+    with self.runDemocrits (["buyer", "seller"]) as (buyer, seller):
 
       self.mainLogger.info ("Setting up test accounts...")
-      self.rpc.xaya.sendmany ("", {
-        seller.xaya.getnewaddress (): 100,
-        buyer.xaya.getnewaddress (): 100,
-      })
-      sellerName = "p/%s" % seller.account
-      mv = {"g": {"nf": {"m": {"a": "test", "n": 10}}}}
-      opt = {"destAddress": seller.xaya.getnewaddress ()}
-      self.rpc.xaya.name_register (sellerName, json.dumps (mv), opt)
+      sellerName = self.setupTradingAccounts (buyer, seller)
       demAsset = self.democritAsset (seller.account, "test")
       jsonAsset = self.jsonAsset (seller.account, "test")
-      self.generate (1)
-      self.syncGame ()
+      emptyBook = {"asset": demAsset, "bids": [], "asks": []}
 
       # We build up a long chain where the name or CHI of the buyer
       # are double spent.  We then invalidate that long chain, do the trade,
@@ -78,7 +68,7 @@ class TradingConflictTest (NonFungibleTest):
       # Set up and take an order.
       self.mainLogger.info ("Executing trade...")
       self.assertEqual (seller.addOrder ("ask", demAsset, 10, 5), True)
-      self.sleepSome ()
+      self.waitForOrderSync ()
       self.assertEqual (buyer.rpc.takeorder (units=2, order={
         "account": seller.account,
         "id": 0,
@@ -87,7 +77,7 @@ class TradingConflictTest (NonFungibleTest):
         "price_sat": int (10e8),
         "max_units": 5,
       }), True)
-      self.updateTrades ()
+      self.updateTrades (forceWait=True)
       self.generate (1)
       tradeBlock = self.rpc.xaya.getbestblockhash ()
       self.updateTrades ()
@@ -113,20 +103,12 @@ class TradingConflictTest (NonFungibleTest):
         "units": 2,
       }
       self.assertEqual (seller.getTrades (), [sellerTrade])
-      self.assertEqual (buyer.getTrades (), [buyerTrade])
-      self.assertEqual (buyer.rpc.getordersforasset (asset=demAsset), {
-        "asset": demAsset,
-        "bids": [],
-        "asks": [],
-      })
-      self.expectApproxBalance (seller.xaya, 120)
-      self.expectApproxBalance (buyer.xaya, 80)
-      self.expectAsset (seller.account, jsonAsset, 8)
-      self.expectAsset (buyer.account, jsonAsset, 2)
-      self.assertEqual (buyer.rpc.getordersforasset (asset=demAsset), {
-        "asset": demAsset,
-        "bids": [],
-        "asks": [],
+      trades, orders = buyer.getTradesAndOrders (demAsset)
+      self.assertEqual (trades, [buyerTrade])
+      self.assertEqual (orders, emptyBook)
+      self.expectBalances (jsonAsset, {seller: 120, buyer: 80}, {
+        seller.account: 8,
+        buyer.account: 2,
       })
 
       # Reorg to the longer chain, which will make the trade fail.
@@ -135,17 +117,18 @@ class TradingConflictTest (NonFungibleTest):
       self.mainLogger.info ("Reorging to a conflicting chain...")
       self.rpc.xaya.reconsiderblock (reorgBlock)
       self.updateTrades ()
-      self.expectApproxBalance (seller.xaya, 100)
-      self.expectApproxBalance (buyer.xaya, 100)
-      self.expectAsset (seller.account, jsonAsset, 10)
-      self.expectAsset (buyer.account, jsonAsset, 0)
+      self.expectBalances (jsonAsset, {seller: 100, buyer: 100}, {
+        seller.account: 10,
+        buyer.account: 0,
+      })
       self.generate (10)
       self.updateTrades ()
       sellerTrade["state"] = "failed"
       buyerTrade["state"] = "failed"
       self.assertEqual (seller.getTrades (), [sellerTrade])
-      self.assertEqual (buyer.getTrades (), [buyerTrade])
-      self.assertEqual (buyer.rpc.getordersforasset (asset=demAsset), {
+      trades, orders = buyer.getTradesAndOrders (demAsset)
+      self.assertEqual (trades, [buyerTrade])
+      self.assertEqual (orders, {
         "asset": demAsset,
         "bids": [],
         "asks": [
@@ -165,14 +148,22 @@ class TradingConflictTest (NonFungibleTest):
     abandons all transactions that are unconfirmed.
     """
 
-    for tx in rpc.listtransactions ():
-      if tx["confirmations"] > 0:
-        continue
-
-      try:
-        rpc.abandontransaction (tx["txid"])
-      except:
-        pass
+    # The default count of listtransactions is just 10, which may miss some
+    # of the transactions.  There may also be multiple entries per txid.
+    txids = dict.fromkeys (tx["txid"]
+                           for tx in rpc.listtransactions ("*", 1_000)
+                           if tx["confirmations"] <= 0)
+    if not txids:
+      return
+
+    # All transactions are abandoned with a single batch request.  Some of
+    # the calls may fail (e.g. if a transaction has already been abandoned
+    # together with its parent), which is fine.  Those errors would only be
+    # raised when accessing the individual results, which we do not need.
+    mc = jsonrpclib.MultiCall (rpc)
+    for txid in txids:
+      mc.abandontransaction (txid)
+    mc ()
 
 
 if __name__ == "__main__":
@@ -31,9 +31,6 @@ integration test.
 
 from testcase import NonFungibleTest
 
-import json
-import time
-
 
 class TradingOneWalletTest (NonFungibleTest):
 
@@ -42,25 +39,17 @@ class TradingOneWalletTest (NonFungibleTest):
 
     self.rpc.xaya.createwallet ("wallet")
 
-    with self.runDemocrit ("wallet") as buyer, \
-         self.runDemocrit ("wallet") as seller:
+    with self.runDemocrits (["wallet", "wallet"]) as (buyer, seller):
 
       self.mainLogger.info ("Setting up test accounts...")
-      self.rpc.xaya.sendtoaddress (buyer.xaya.getnewaddress (), 100)
-      sellerName = "p/%s" % seller.account
-      mv = {"g": {"nf": {"m": {"a": "test", "n": 10}}}}
-      opt = {"destAddress": seller.xaya.getnewaddress ()}
-      self.rpc.xaya.name_register (sellerName, json.dumps (mv), opt)
+      self.setupTradingAccounts (buyer, seller)
       demAsset = self.democritAsset (seller.account, "test")
       jsonAsset = self.jsonAsset (seller.account, "test")
-      self.generate (1)
-      self.syncGame ()
 
       self.mainLogger.info ("Setting up orders...")
       self.assertEqual (seller.addOrder ("ask", demAsset, 10, 5), True)
       self.assertEqual (buyer.addOrder ("bid", demAsset, 5, 2), True)
-      self.sleepSome ()
-      self.assertEqual (buyer.rpc.getordersforasset (asset=demAsset), {
+      self.waitForOrderbook (buyer, demAsset, {
         "asset": demAsset,
         "bids": [],
         "asks": [
@@ -73,7 +62,7 @@ class TradingOneWalletTest (NonFungibleTest):
           },
         ],
       })
-      self.assertEqual (seller.rpc.getordersforasset (asset=demAsset), {
+      self.waitForOrderbook (seller, demAsset, {
         "asset": demAsset,
         "bids": [
           {
@@ -96,7 +85,7 @@ class TradingOneWalletTest (NonFungibleTest):
         "price_sat": int (5e8),
         "max_units": 2,
       }), True)
-      self.updateTrades ()
+      self.updateTrades (forceWait=True)
       self.assertEqual (buyer.rpc.takeorder (units=3, order={
             "account": seller.account,
             "id": 0,
@@ -105,10 +94,11 @@ class TradingOneWalletTest (NonFungibleTest):
             "price_sat": int (10e8),
             "max_units": 5,
       }), True)
-      self.updateTrades ()
+      self.updateTrades (forceWait=True)
 
       self.mainLogger.info ("Timing out failed trades...")
-      time.sleep (3)
+      self.waitForTradeTimeout ()
+      self.updateTrades ()
       # We do not care about the details of the trades (there are enough
       # other tests for that), but we should have two abandoned trades
       # in each account.
@@ -120,8 +110,10 @@ class TradingOneWalletTest (NonFungibleTest):
       # should actually be exact this time.
       for d in [buyer, seller]:
         self.assertEqual (d.xaya.getbalance (), 100)
-      self.expectAsset (seller.account, jsonAsset, 10)
-      self.expectAsset (buyer.account, jsonAsset, 0)
+      self.expectAssets (jsonAsset, {
+        seller.account: 10,
+        buyer.account: 0,
+      })
 
 
 if __name__ == "__main__":
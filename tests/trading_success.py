@@ -22,39 +22,26 @@ Tests a "normal", successful trade flow between two parties.
 
 from testcase import NonFungibleTest
 
-import json
-
 
 class TradingSuccessTest (NonFungibleTest):
 
   def run (self):
     self.collectPremine ()
 
-    self.rpc.xaya.createwallet ("buyer")
-    self.rpc.xaya.createwallet ("seller")
+    self.createWallets (["buyer", "seller"])
 
-    with self.runDemocrit ("buyer") as buyer, \
-         self.runDemocrit ("seller") as seller:
+    with self.runDemocrits (["buyer", "seller"]) as (buyer, seller):
 
       self.mainLogger.info ("Setting up test accounts...")
-      self.rpc.xaya.sendmany ("", {
-        seller.xaya.getnewaddress (): 100,
-        buyer.xaya.getnewaddress (): 100,
-      })
-      sellerName = "p/%s" % seller.account
-      mv = {"g": {"nf": {"m": {"a": "test", "n": 10}}}}
-      opt = {"destAddress": seller.xaya.getnewaddress ()}
-      self.rpc.xaya.name_register (sellerName, json.dumps (mv), opt)
+      sellerName = self.setupTradingAccounts (buyer, seller)
       demAsset = self.democritAsset (seller.account, "test")
       jsonAsset = self.jsonAsset (seller.account, "test")
-      self.generate (1)
-      self.syncGame ()
+      emptyBook = {"asset": demAsset, "bids": [], "asks": []}
 
       self.mainLogger.info ("Setting up orders...")
       self.assertEqual (seller.addOrder ("ask", demAsset, 10, 5), True)
       self.assertEqual (buyer.addOrder ("bid", demAsset, 5, 2), True)
-      self.sleepSome ()
-      self.assertEqual (buyer.rpc.getordersforasset (asset=demAsset), {
+      self.waitForOrderbook (buyer, demAsset, {
         "asset": demAsset,
         "bids": [],
         "asks": [
@@ -67,7 +54,7 @@ class TradingSuccessTest (NonFungibleTest):
           },
         ],
       })
-      self.assertEqual (seller.rpc.getordersforasset (asset=demAsset), {
+      self.waitForOrderbook (seller, demAsset, {
         "asset": demAsset,
         "bids": [
           {
@@ -90,7 +77,7 @@ class TradingSuccessTest (NonFungibleTest):
         "price_sat": int (5e8),
         "max_units": 2,
       }), True)
-      self.updateTrades ()
+      self.updateTrades (forceWait=True)
       sellerTrade1 = {
         "state": "pending",
         "counterparty": buyer.account,
@@ -109,13 +96,10 @@ class TradingSuccessTest (NonFungibleTest):
         "price_sat": int (5e8),
         "units": 2,
       }
-      self.assertEqual (seller.getTrades (), [sellerTrade1])
       self.assertEqual (buyer.getTrades (), [buyerTrade1])
-      self.assertEqual (seller.rpc.getordersforasset (asset=demAsset), {
-        "asset": demAsset,
-        "bids": [],
-        "asks": [],
-      })
+      trades, orders = seller.getTradesAndOrders (demAsset)
+      self.assertEqual (trades, [sellerTrade1])
+      self.assertEqual (orders, emptyBook)
 
       # Updating the name and spending more CHI now should work, but it
       # will be based on the unconfirmed output in the wallet and thus
@@ -139,10 +123,10 @@ class TradingSuccessTest (NonFungibleTest):
 
       # Check the outcome, i.e. that the asset and CHI have been transferred
       # as expected.
-      self.expectApproxBalance (seller.xaya, 111)
-      self.expectApproxBalance (buyer.xaya, 89)
-      self.expectAsset (seller.account, jsonAsset, 8)
-      self.expectAsset (buyer.account, jsonAsset, 2)
+      self.expectBalances (jsonAsset, {seller: 111, buyer: 89}, {
+        seller.account: 8,
+        buyer.account: 2,
+      })
 
       self.mainLogger.info ("Taking sell order...")
       self.assertEqual (buyer.rpc.takeorder (units=3, order={
@@ -153,7 +137,7 @@ class TradingSuccessTest (NonFungibleTest):
             "price_sat": int (10e8),
             "max_units": 5,
       }), True)
-      self.updateTrades ()
+      self.updateTrades (forceWait=True)
       sellerTrade2 = {
         "state": "pending",
         "counterparty": buyer.account,
@@ -173,20 +157,18 @@ class TradingSuccessTest (NonFungibleTest):
         "units": 3,
       }
       self.assertEqual (seller.getTrades (), [sellerTrade2, sellerTrade1])
-      self.assertEqual (buyer.getTrades (), [buyerTrade2, buyerTrade1])
-      self.assertEqual (buyer.rpc.getordersforasset (asset=demAsset), {
-        "asset": demAsset,
-        "bids": [],
-        "asks": [],
-      })
+      trades, orders = buyer.getTradesAndOrders (demAsset)
+      self.assertEqual (trades, [buyerTrade2, buyerTrade1])
+      self.assertEqual (orders, emptyBook)
 
       self.generate (10)
       self.updateTrades ()
       sellerTrade2["state"] = "success"
       buyerTrade2["state"] = "success"
       self.assertEqual (seller.getTrades (), [sellerTrade1, sellerTrade2])
-      self.assertEqual (buyer.getTrades (), [buyerTrade1, buyerTrade2])
-      self.assertEqual (buyer.rpc.getordersforasset (asset=demAsset), {
+      trades, orders = buyer.getTradesAndOrders (demAsset)
+      self.assertEqual (trades, [buyerTrade1, buyerTrade2])
+      self.assertEqual (orders, {
         "asset": demAsset,
         "bids": [],
         "asks": [
@@ -200,10 +182,10 @@ class TradingSuccessTest (NonFungibleTest):
         ],
       })
 
-      self.expectApproxBalance (seller.xaya, 111 + 30)
-      self.expectApproxBalance (buyer.xaya, 89 - 30)
-      self.expectAsset (seller.account, jsonAsset, 8 - 3)
-      self.expectAsset (buyer.account, jsonAsset, 2 + 3)
+      self.expectBalances (jsonAsset, {seller: 111 + 30, buyer: 89 - 30}, {
+        seller.account: 8 - 3,
+        buyer.account: 2 + 3,
+      })
 
 
 if __name__ == "__main__":